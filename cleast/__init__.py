@@ -1 +1,3 @@
-from .cleast import Cleast
\ No newline at end of file
+from .cleast import Cleast
+
+__all__ = ["Cleast"]
@@ -1,8 +1,10 @@
 from __future__ import annotations
 from enum import Enum
+from functools import lru_cache
+from itertools import count
 
-from clingo.ast import AST, ASTType, ASTSequence
-from typing import List, Tuple, Set
+from clingo.ast import AST, ASTType
+from typing import List, Tuple
 
 from .symbol import Symbol
 
@@ -20,6 +22,23 @@ class ASTLineType(Enum):
     Output = 'Output'
 
 
+_PATH_TO_MODULE = str.maketrans('/', '.')
+
+
+@lru_cache(maxsize=None)
+def _prefix(filename: str, src_dir: str) -> str:
+    """
+    Returns the dotted module prefix of a file relative to the source directory (e.g. `sub/lib.lp` gives `sub.lib.`).
+    """
+    if filename.startswith(src_dir):
+        prefix = filename[len(src_dir) + 1:]
+    else:
+        prefix = filename[1:]
+    if prefix.endswith('.lp'):
+        prefix = prefix[:-3]
+    return prefix.translate(_PATH_TO_MODULE) + '.'
+
+
 class ASTLine:
     """
     Represents a line of the logic program, encapsulating the corresponding clingo AST node and the symbols defined or used on that line.
@@ -27,6 +46,9 @@ class ASTLine:
     :param define: The list of symbols defined on this line.
     :param dependencies: The list of symbols used on this line.
     """
+    __slots__ = ('ast', 'define', 'dependencies', 'comments', 'location',
+                 'section', '_identifier', 'prefix', 'type')
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         self.ast = ast
         self.define = define
@@ -55,85 +77,48 @@ class ASTLine:
         :return: An instance of the appropriate ASTLine subclass (e.g. Rule, Constraint, Fact, Definition, Input, or Output)
         """
         
-        ret = None
-        if ast.ast_type == ASTType.Rule:
+        ast_type = ast.ast_type
+        if ast_type == ASTType.Rule:
             if define and dependencies:
-                ret =  Rule(ast, define, dependencies)
-            elif define and not dependencies:
-                ret = Fact(ast, define, dependencies)
-            elif not define and dependencies:
-                ret = Constraint(ast, define, dependencies)
+                kind = Rule
+            elif define:
+                kind = Fact
+            elif dependencies:
+                kind = Constraint
             else:
+                kind = None
                 print('Problem')
         else:
-            if ast.ast_type == ASTType.Defined:
-                ret= Input(ast, define, dependencies)
-            elif ast.ast_type == ASTType.Definition:
-                ret =  Definition(ast, define, dependencies)
-            elif ast.ast_type == ASTType.ShowSignature or ast.ast_type == ASTType.ShowTerm:
-                ret = Output(ast, define, dependencies)
-            else:
-                print(ast, ast.ast_type)
+            kind = _DISPATCH.get(ast_type)
+            if kind is None:
+                print(ast, ast_type)
                 print('To be ignore or not implemented yet')
-        if ret:
+
+        ret = None
+        if kind:
+            ret = kind(ast, define, dependencies)
             ret.section = section
             ret.comments = comments
-            prefix = ret.location.begin.filename.replace(
-                src_dir, "")[1:]
-            prefix = prefix.replace('/', '.')
-            prefix = prefix.replace('.lp', "")
-            prefix += '.'
-            ret.prefix = prefix
+            ret.prefix = _prefix(ret.location.begin.filename, src_dir)
         
         return ret
     
     
     @classmethod
-    def build_ast_lines(cls, ast_list:List[AST], cleast:"Cleast") -> Tuple[List["ASTLine"], List["ASTLine"]]:
+    def build_ast_lines(cls, statements: List[Tuple[AST, List[Symbol], List[Symbol]]], cleast: "Cleast") -> Tuple[List["ASTLine"], List["ASTLine"]]:
         """
-        Builds the final AST lines, by extracting the symbols and dependencies from the given list of AST elements. 
+        Builds the final AST lines from the given statements and the symbols they define and depend on. 
         This method will also filter the lines based on their file origin, and return the internal and external (coming from an #include statement) lines separately.
         
-        :param ast_list: A tuple of lists containing the internal and external AST elements.
+        :param statements: A list of (ast, define, dependencies) tuples, one per top level AST element.
         :return: A tuple of lists containing the internal and external AST lines.
         """
-
-        def deep_search_sym_dep(ast: AST, sym: Set, dep: Set, trace: List):
-            new_trace = trace.copy()
-            if isinstance(ast, ASTSequence):
-                new_trace.append('ASTSequence')
-                for _ast in ast:
-                    deep_search_sym_dep(_ast, sym, dep, new_trace)
-            else:
-                new_trace.append(ast.ast_type)
-                if ast.ast_type == ASTType.SymbolicAtom:
-                    if 'head' in new_trace:
-                        if 'head' in new_trace and ASTType.ConditionalLiteral in new_trace and 'condition' in new_trace:
-                            dep.add(cleast.get_symbol(ast))
-                        else:
-                            sym.add(cleast.get_symbol(ast))
-                    elif 'body':
-                        dep.add(cleast.get_symbol(ast))
-                    else:
-                        sym.add(cleast.get_symbol(ast))
-                else:
-                    if ast.child_keys:
-                        for child in ast.child_keys:
-                            a = eval(f'ast.{child}')
-                            if a:
-                                new_trace.append(child)
-                                deep_search_sym_dep(
-                                    a, sym, dep, new_trace)
-                                new_trace.remove(child)
-                return (sym, dep)
-
         ast_lines = []
         external_ast_lines = []
 
-        for ast in ast_list:
-            syms, dependencies = deep_search_sym_dep(ast, set(), set(), [])
+        for ast, syms, dependencies in statements:
             al = ASTLine.factory(ast, syms, dependencies,
-                                 section=cleast.get_section(ast),
+                                 section=cleast.get_sections(ast),
                                  comments=cleast.get_comments(ast),
                                  src_dir=cleast.src_dir)
             
@@ -148,32 +133,52 @@ class ASTLine:
         
 
 
-class Rule(ASTLine):
+class _DefiningLine(ASTLine):
+    """
+    Base of the lines identified by the signature of the first symbol they define.
+    """
+    __slots__ = ()
+
+    @property
+    def identifier(self):
+        # Computed on first access, from the first defined symbol
+        if self._identifier is None:
+            self._identifier = self.define[0].signature
+        return self._identifier
+
+
+class Rule(_DefiningLine):
+    __slots__ = ()
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Rule
-        self._identifier = str(list(self.define)[0].signature)
 
 
 class Constraint(ASTLine):
-    id = 0
+    # itertools.count keeps ids unique when files are loaded from several threads
+    _ids = count()
+
+    __slots__ = ('id',)
 
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Constraint
-        self.id = Constraint.id
-        Constraint.id += 1
+        self.id = next(Constraint._ids)
         self._identifier = f"Constraint#{self.id}"
 
 
-class Fact(ASTLine):
+class Fact(_DefiningLine):
+    __slots__ = ()
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Fact
-        self._identifier = str(list(self.define)[0].signature)
 
 
 class Definition(ASTLine):
+    __slots__ = ()
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Definition
@@ -181,6 +186,8 @@ class Definition(ASTLine):
 
 
 class Input(ASTLine):
+    __slots__ = ()
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Input
@@ -188,6 +195,8 @@ class Input(ASTLine):
 
 
 class Output(ASTLine):
+    __slots__ = ()
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Output
@@ -198,7 +207,18 @@ class Output(ASTLine):
 
 
 class Constant(ASTLine):
+    __slots__ = ()
+
     def __init__(self, ast: AST, define: List[Symbol], dependencies: List[Symbol]) -> None:
         super().__init__(ast, define, dependencies)
         self.type = ASTLineType.Constant
         self._identifier = self.ast.name
+
+
+# AST types, other than rules, mapped to the ASTLine subclass built for them
+_DISPATCH = {
+    ASTType.Defined: Input,
+    ASTType.Definition: Definition,
+    ASTType.ShowSignature: Output,
+    ASTType.ShowTerm: Output,
+}
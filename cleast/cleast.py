@@ -1,5 +1,11 @@
 from __future__ import annotations
-from typing import List
+import bisect
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+from typing import Dict, List, Tuple
 from clingo.ast import AST, ASTType, ProgramBuilder, parse_files
 from clingo import Control
 
@@ -9,9 +15,98 @@ from .symbol import Symbol
 from .variable import Variable
 from .astline import ASTLine, ASTLineType
 from .comment import Comment
-from .utils import get_dir_filename
+from .utils import get_dir_filename, walk_ast, BODY, CONDITION
 
 
+# Parsed programs by path as given and absolute path: (watched files with their mtime, AST list, file lines).
+# The given path is part of the key because clingo reports it in every AST location.
+_PARSE_CACHE: Dict[Tuple[str, str], Tuple[Tuple[Tuple[str, float | None], ...], List[AST], List[str]]] = {}
+# Cleast objects built by Cleast.from_file, along with the AST list they were built from
+_CLEAST_CACHE: Dict[Tuple[type, str, str, bool], Tuple[List[AST], "Cleast"]] = {}
+_CACHE_SIZE = 64
+
+_INCLUDE = re.compile(r'#include\s*"([^"]*)"')
+
+
+def _cache_put(cache: Dict, key, value) -> None:
+    """
+    Stores a value in a bounded cache, evicting the oldest entry when full.
+    """
+    cache.pop(key, None)
+    if len(cache) >= _CACHE_SIZE:
+        cache.pop(next(iter(cache)), None)
+    cache[key] = value
+
+
+def _mtime(path: str) -> float | None:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _watched_files(file: str) -> Dict[str, float | None]:
+    """
+    Returns the given file and every file it may include, recursively, with their modification time (None if missing).
+    Includes are found by scanning the files themselves, so files holding no statement are watched too.
+    A relative include is watched both next to the including file and relative to the working directory, the two places clingo looks for it.
+
+    :param file: location of the file
+    :return: A dictionary from watched files to their modification time.
+    """
+    watched = {}
+    pending = [file]
+    while pending:
+        source = pending.pop()
+        if source in watched:
+            continue
+        watched[source] = _mtime(source)
+        try:
+            with open(source) as f:
+                includes = _INCLUDE.findall(f.read())
+        except (OSError, UnicodeDecodeError):
+            continue
+        for include in includes:
+            if not os.path.isabs(include):
+                pending.append(os.path.join(os.path.dirname(source), include))
+            pending.append(include)
+    return watched
+
+
+def _parse_file(file: str, cache: bool = True) -> Tuple[List[AST], List[str]]:
+    """
+    Parses a logic program file, reusing the previous result as long as neither the file nor any file it includes was modified.
+
+    :param file: location of the file
+    :param cache: if False, the file is parsed again and the result is not stored
+    :return: The AST list of the program and the lines of the file.
+    """
+    key = (file, os.path.abspath(file))
+    cached = _PARSE_CACHE.get(key) if cache else None
+    if cached is not None:
+        watched, ast_list, file_lines = cached
+        if all(_mtime(source) == mtime for source, mtime in watched):
+            return ast_list, file_lines
+
+    # Modification times are taken before parsing, so an edit made meanwhile invalidates the entry
+    watched = _watched_files(file) if cache else None
+    with open(file) as f:
+        file_lines = f.readlines()
+
+    ctl = Control()
+    ast_list = []
+    with ProgramBuilder(ctl) as _:
+        parse_files([file], ast_list.append)
+
+    if cache:
+        for ast in ast_list:
+            source = ast.location.begin.filename
+            if source not in watched:
+                watched[source] = _mtime(source)
+
+        _cache_put(_PARSE_CACHE, key, (tuple(watched.items()), ast_list, file_lines))
+    return ast_list, file_lines
+
 
 class Cleast:
     """
@@ -22,6 +117,7 @@ class Cleast:
     :param file: str list representing the file
     :param filename: location of the file
     :param src_dir: location
+    :param include_external: if False, AST elements coming from an #include statement are skipped before being walked
     """
 
     def __init__(self,
@@ -29,6 +125,7 @@ class Cleast:
                  file: List[str],
                  filename: str,
                  src_dir: str,
+                 include_external: bool = True,
                  ) -> None:
 
         self.file = file
@@ -37,35 +134,114 @@ class Cleast:
 
         self.directives = Directive.extract_directives(
             self.file, self.filename)
+        self._sorted_sections = sorted(self.directives.get('section', []),
+                                       key=lambda directive: directive.line_number)
+        self._section_lines = [section.line_number for section in self._sorted_sections]
 
         self.comments = Comment.extract_comments(file, filename)
+        self._comments_by_line = {}
+        for comment in self.comments:
+            self._comments_by_line.setdefault(
+                comment.location.begin.line, []).append(comment)
 
-        self.symbols = Symbol.extract_symbols(
-            ast_list, self.directives.get('predicates'), filename)
+        # Symbols, variables and the symbols defined and used by each statement
+        # are all collected in a single walk over the AST.
+        predicate_directives = {directive.parameters[0]: directive
+                                for directive in self.directives.get('predicates', [])}
+        var_directives = {directive.parameters[0]: directive
+                          for directive in self.directives.get('var', [])}
 
-        self.variables = Variable.extract_variables(
-            ast_list, self.directives.get('var'), filename)
+        self.symbols = []
+        self.variables = []
+        self.symbol_dict = {}
+        self._symbol_intern = {}
+        statements = []
+        for ast in ast_list:
+            local = ast.location.begin.filename == filename
+            if not local and not include_external:
+                continue
+            define, dependencies = [], []
+            for node, ast_type, flags in walk_ast(ast):
+                if ast_type == ASTType.SymbolicAtom:
+                    if local:
+                        # Reading the name goes through clingo: skip it when there is nothing to match
+                        directive = predicate_directives.get(node.symbol.name) if predicate_directives else None
+                        symbol = Symbol(node, directive)
+                        self.symbols.append(symbol)
+                        symbol = self.symbol_dict.setdefault(
+                            (symbol.name, symbol.location), symbol)
+                    else:
+                        symbol = self.get_symbol(node)
+                    # CONDITION is only set below a head, so one mask test covers both cases
+                    if flags & (BODY | CONDITION):
+                        dependencies.append(symbol)
+                    else:
+                        define.append(symbol)
+                elif local and ast_type == ASTType.Variable:
+                    self.variables.append(
+                        Variable(node, var_directives.get(node.name) if var_directives else None))
+            # Order preserving deduplication, done once per statement
+            statements.append((ast, list(dict.fromkeys(define)),
+                               list(dict.fromkeys(dependencies))))
 
         self.ast_lines, self.external_ast_lines = ASTLine.build_ast_lines(
-            ast_list, self)
+            statements, self)
+
+        # Elements by line, an element being found at its line and at the previous one
+        self._by_line = {}
+        for directive in chain.from_iterable(self.directives.values()):
+            self._add_to_line(directive.line_number, directive)
+        for elem in chain(self.comments, self.variables, self.ast_lines):
+            self._add_to_line(elem.location.begin.line, elem)
+
+    def _add_to_line(self, line: int, elem) -> None:
+        self._by_line.setdefault(line, []).append(elem)
+        self._by_line.setdefault(line - 1, []).append(elem)
         
     @classmethod
-    def from_file(cls, file:str):
+    def from_file(cls, file:str, include_external:bool = True, cache:bool = True):
+        """
+        Builds a Cleast object from a logic program file.
 
-        ctl = Control()
-        with open(file) as f:
-            file_lines = f.readlines()
+        .. note:
+            With `cache` enabled, the same object is returned on later calls as long as neither the file nor any file it includes was modified. This object is shared between all callers: modifying it (e.g. its `ast_lines`, `symbols` or `comments`) affects every later result. Pass `cache=False` to get an object of your own.
 
-        ast_list = []
-        with ProgramBuilder(ctl) as _:
-            parse_files([file], ast_list.append)
+        :param file: location of the file
+        :param include_external: see `Cleast`
+        :param cache: if False, the file is parsed again and a new object is built, without reading or filling any cache
+        :return: A Cleast object.
+        """
+        ast_list, file_lines = _parse_file(file, cache)
+        key = (cls, file, os.path.abspath(file), include_external)
+        cached = _CLEAST_CACHE.get(key) if cache else None
+        # The parse cache hands back the very same list while the sources are unchanged
+        if cached is not None and cached[0] is ast_list:
+            return cached[1]
+        file_lines = list(file_lines)
 
         if '/' in file:
             path = file[:file.rindex('/')]
         else :
             path = get_dir_filename('.')
         
-        return cls(ast_list, file_lines, file, path)
+        cleast = cls(ast_list, file_lines, file, path, include_external)
+        if cache:
+            _cache_put(_CLEAST_CACHE, key, (ast_list, cleast))
+        return cleast
+
+    @classmethod
+    def from_files(cls, files: List[str], include_external: bool = True, max_workers: int | None = None, cache: bool = True) -> List[Cleast]:
+        """
+        Builds a Cleast object for each of the given files. The files are independent, so they are loaded from a thread pool.
+
+        :param files: locations of the files
+        :param include_external: see `Cleast`
+        :param max_workers: maximum number of threads, defaults to the ThreadPoolExecutor default
+        :param cache: see `Cleast.from_file`
+        :return: A list of Cleast objects, in the same order as `files`.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(partial(cls.from_file, include_external=include_external, cache=cache), files))
         
     # Private methods    
     def get_comments(self, ast: AST) -> List[Comment]:
@@ -76,13 +252,7 @@ class Cleast:
         :param file: A list of strings representing the lines of the logic program file.
         :return: A list of comments.
         """
-        ret = []
-        line_number = ast.location.begin.line
-        for comment in self.comments:
-            if line_number == comment.location.begin.line:
-                ret.append(comment)
-
-        return ret
+        return list(self._comments_by_line.get(ast.location.begin.line, ()))
 
     def get_sections(self, obj) -> Directive | None:
         """
@@ -92,28 +262,26 @@ class Cleast:
         :param obj: An object with a location attribute, such as an AST node or a Symbol.
         :return: The section Directive that the object belongs to, or None if no associated section directive is found.
         """
-        line = obj.location.begin.line - 1
-        current_section = None
-        if self.directives.get('section'):
-            for section in sorted(self.directives['section'], key=lambda directive: directive.line_number):
-                if section.line_number < line:
-                    current_section = section
-                else:
-                    break
-        return current_section
+        # Last section whose line_number is strictly lower than begin.line - 1
+        idx = bisect.bisect_right(self._section_lines, obj.location.begin.line - 2)
+        return self._sorted_sections[idx - 1] if idx else None
 
     def get_symbol(self, ast: ASTType.SymbolicAtom):
         """
         Given an AST symbolic atom, returns the Symbol object already computed that corresponds to it.
 
         :param ast: The AST symbolic atom to find the corresponding Symbol for.
-        :return: The Symbol object corresponding to the given AST symbolic atom, or None if no such symbol is found.
+        :return: The Symbol object corresponding to the given AST symbolic atom. Atoms with no extracted symbol (e.g. from an included file) share one Symbol per signature.
         """
-        for symbol in self.symbols:
-            if ast.symbol.name == symbol.name and ast.symbol.location == symbol.location:
-                return symbol
+        symbol = self.symbol_dict.get((ast.symbol.name, ast.symbol.location))
+        if symbol is None:
+            signature = (ast.symbol.name, len(ast.symbol.arguments))
+            symbol = self._symbol_intern.get(signature)
+            if symbol is None:
+                symbol = Symbol(ast, None)
+                self._symbol_intern[signature] = symbol
 
-        return Symbol(ast, None)
+        return symbol
 
     # Pulic methods
     def get_line(self, line: int):
@@ -123,26 +291,22 @@ class Cleast:
         :param line: line number where the elements needs to be retrieve
         :return: A list of element
         """
-        ret = []
-        all_elem = []
-        all_elem.extend(self.directives)
-        all_elem.extend(self.comments)
-        all_elem.extend(self.variables)
-        all_elem.extend(self.ast_lines)
-
-        for elem in all_elem:
-            if elem.location.begin.line == line or elem.location.begin.line-1 == line:
-                ret.append(ret)
-        return ret
+        return list(self._by_line.get(line, ()))
 
 
     def get_ast_lines(self,
                       kind: ASTLineType | None = None,
                       local: bool = False):
-        all_ast = self.ast_lines.copy()
-        if not local : all_ast.extend(self.external_ast_lines)
-        
+        """
+        Returns the AST lines of the program, optionally filtered by type.
+
+        :param kind: if given, only the AST lines of this type are returned
+        :param local: if True, the AST lines coming from an #include statement are left out
+        :return: A new list of ASTLine
+        """
+        all_ast = self.ast_lines if local else chain(self.ast_lines, self.external_ast_lines)
+
         if kind:
-            return [ast_line for ast_line in all_ast if ast_line.type == kind]
+            return [ast_line for ast_line in all_ast if ast_line.type is kind]
         else:
-            return all_ast
+            return list(all_ast)
@@ -1,9 +1,14 @@
 from __future__ import annotations
+import re
+from bisect import bisect_right
 from clingo.ast import Location, Position
 from typing import List
 
 from .utils import parse_content_from_location
 
+# A large comment runs until the next '*%' (or the end of the file when unclosed), any other '%' comments out the rest of its line
+_COMMENT = re.compile(r'(?P<large>%\*.*?(?P<end>\*%)|%\*.*\Z)|%[^\n]*', re.DOTALL)
+
 
 class Comment:
     def __init__(self, location:Location, large_comment:bool, content:str) -> None:
@@ -13,28 +18,32 @@ class Comment:
 
     @classmethod
     def extract_comments(cls, file:List[str], filename=str) -> List[Comment]:
-        in_comment = False 
+        # Lines are joined with a separator so that they do not need to end with a newline,
+        # and so that no comment delimiter can span two lines.
+        text = '\n'.join(file)
+        line_starts = []
+        offset = 0
+        for line in file:
+            line_starts.append(offset)
+            offset += len(line) + 1
+
+        def position(offset: int):
+            idx_row = bisect_right(line_starts, offset) - 1
+            return idx_row, offset - line_starts[idx_row]
+
         comments = []
-        begin = None
-        for idx_row,line in enumerate(file):
-            for idx_column, char in enumerate(line):
-                
-                if char == "%" and not in_comment:
-                    begin = Position(filename,idx_row,idx_column+1)
-                    if idx_column < len(line) and line[idx_column+1] == '*':
-                        in_comment = True
-                    else:
-                        location = Location(begin,Position(filename,idx_row,len(line)))
-                        content = parse_content_from_location(file,location)
-                        comments.append(Comment(location,False,content))
-                        
-                if char == '*' and in_comment:
-                    if idx_column < len(line) and line[idx_column+1] == '%':
-                        in_comment = False
-                        
-                        location = Location(begin,Position(filename,idx_row,idx_column-1))
-                        content = parse_content_from_location(file,location)
-                        comments.append(Comment(location, True, content))
+        for match in _COMMENT.finditer(text):
+            idx_row, idx_column = position(match.start())
+            begin = Position(filename,idx_row,idx_column+1)
+            if match.group('large') is None:
+                location = Location(begin,Position(filename,idx_row,len(file[idx_row])))
+                content = parse_content_from_location(file,location)
+                comments.append(Comment(location,False,content))
+            elif match.group('end'):
+                idx_row, idx_column = position(match.end() - 2)
+                location = Location(begin,Position(filename,idx_row,idx_column-1))
+                content = parse_content_from_location(file,location)
+                comments.append(Comment(location, True, content))
                           
         return comments
     
@@ -1,8 +1,9 @@
 from __future__ import annotations
-from clingo.ast import SymbolicAtom, AST, ASTSequence, ASTType
+from clingo.ast import SymbolicAtom, AST, ASTType
 from typing import List
 
 from .directive import Directive
+from .utils import walk_ast
 
 
 class Symbol:
@@ -44,32 +45,13 @@ class Symbol:
         :param current_file: The path of the current file.
         :return: A list of Symbol objects representing the symbols found in the given list of AST nodes.
         """
-        def rec_extraction(pool: List, ast: AST, predicate_directives: List[Directive] | None):
-            if isinstance(ast, ASTSequence):
-                for a in ast:
-                    rec_extraction(pool, a, predicate_directives)
-            else:
-                if ast.ast_type == ASTType.SymbolicAtom:
-                    if predicate_directives:
-                        for directive in predicate_directives:
-                            if directive.parameters[0] == ast.symbol.name:
-                                pool.append(cls(ast, directive))
-                                break
-                            else:
-                                pool.append(cls(ast, None))
-                    else:
-                        pool.append(cls(ast, None))
-                else:
-                    if ast.child_keys:
-                        for key in ast.child_keys:
-                            ast_child = eval(f'ast.{key}')
-                            if ast_child:
-                                rec_extraction(pool, ast_child, predicate_directives)
+        directive_dict = {directive.parameters[0]: directive for directive in predicate_directives or []}
 
         pool = []
-        # print(ast_list)
         for ast in ast_list:
             if ast.location.begin.filename == current_file_path:
-                rec_extraction(pool, ast, predicate_directives)
+                for node, ast_type, _ in walk_ast(ast):
+                    if ast_type == ASTType.SymbolicAtom:
+                        pool.append(cls(node, directive_dict.get(node.symbol.name) if directive_dict else None))
 
-        return pool
\ No newline at end of file
+        return pool
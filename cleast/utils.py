@@ -1,7 +1,16 @@
 import os
+from operator import attrgetter
 
-from clingo.ast import Location
-from typing import Dict, List
+from clingo.ast import AST, ASTSequence, ASTType, Location
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Context flags yielded by walk_ast
+HEAD = 1
+BODY = 2
+CONDITION = 4
+
+# Child keys (in reverse order) and their getter, cached per AST type
+_CHILD_KEYS_CACHE: Dict[ASTType, Tuple[Tuple[str, ...], Callable[[AST], Tuple]]] = {}
 
 def get_dir_filename(filename:str) -> str:
     """
@@ -92,4 +101,51 @@ def parse_content_from_location(file:List[str], location:Location) -> str:
         ret += l
     
     return ret
-    
\ No newline at end of file
+
+
+def _child_keys_getter(ast: AST) -> Tuple[Tuple[str, ...], Callable[[AST], Tuple]]:
+    keys = tuple(reversed(ast.child_keys))
+    if len(keys) > 1:
+        return keys, attrgetter(*keys)
+    if keys:
+        key = keys[0]
+        return keys, lambda a: (getattr(a, key),)
+    return keys, lambda a: ()
+
+
+def walk_ast(ast: AST, flags: int = 0) -> Iterator[Tuple[AST, ASTType, int]]:
+    """
+    A helper function to iterate over every node of an AST in depth-first order, without recursion.
+
+    Each node is yielded along with its type, computed once per node, and a bitmask describing its context: `HEAD` and `BODY` are set below
+    a `head` or `body` child, and `CONDITION` is set below the condition of a conditional literal found in a head.
+
+    :param ast: The AST node (or sequence of nodes) to walk.
+    :param flags: The context flags of the given node.
+    :returns: An iterator of (node, ast_type, flags) tuples.
+    """
+    stack = [(ast, flags)]
+    while stack:
+        ast, flags = stack.pop()
+        if isinstance(ast, ASTSequence):
+            stack.extend((a, flags) for a in reversed(ast))
+            continue
+
+        ast_type = ast.ast_type
+        yield ast, ast_type, flags
+        cached = _CHILD_KEYS_CACHE.get(ast_type)
+        if cached is None:
+            cached = _CHILD_KEYS_CACHE[ast_type] = _child_keys_getter(ast)
+        keys, getter = cached
+        if keys:
+            conditional = flags & HEAD and ast_type == ASTType.ConditionalLiteral
+            for child, a in zip(keys, getter(ast)):
+                if a:
+                    child_flags = flags
+                    if child == 'head':
+                        child_flags |= HEAD
+                    elif child == 'body':
+                        child_flags |= BODY
+                    elif child == 'condition' and conditional:
+                        child_flags |= CONDITION
+                    stack.append((a, child_flags))